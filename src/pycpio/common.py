@@ -3,6 +3,8 @@ from typing import Protocol, TypedDict
 
 
 class Loggified(Protocol):
+    __slots__ = ()
+
     logger: Logger
 
 
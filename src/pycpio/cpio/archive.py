@@ -13,7 +13,7 @@ from .symlink import CPIO_Symlink
 
 
 class CPIOArchive(dict, Loggified):
-    __slots__ = ("logger",)
+    __slots__ = ("logger", "structure", "inodes", "hashes", "sizes")
 
     from pycpio.header import HEADER_NEW
 
@@ -26,17 +26,18 @@ class CPIOArchive(dict, Loggified):
         if value.header.ino in self.inodes:
             if isinstance(value, CPIO_Symlink):
                 self.logger.debug(
-                    "[%s] Symlink inode already exists: %s"
-                    % (value.header.name, value.header.ino)
+                    "[%s] Symlink inode already exists: %s",
+                    value.header.name,
+                    value.header.ino,
                 )
-            elif self[self.inodes[value.header.ino][0]].data == value.data:
+            elif self[self.inodes[value.header.ino][0]].hash == value.hash:
                 self.logger.info(
                     "[%s] New hardlink detected, removing data." % value.header.name
                 )
                 # Remove the data from the current entry
                 value.data = b""
-            elif value.data == b"":
-                self.logger.debug("[%s] Hardlink detected." % value.header.name)
+            elif not value.header.filesize_i:
+                self.logger.debug("[%s] Hardlink detected.", value.header.name)
             else:
                 from .common import get_new_inode
 
@@ -51,13 +52,9 @@ class CPIOArchive(dict, Loggified):
             # Create an inode entry with the name
             self.inodes[value.header.ino] = [name]
 
-        # Check if the hash already exists and the data is not empty
-        if (
-            value.hash in self.hashes
-            and value.data != b""
-            and not isinstance(value, CPIO_Symlink)
-        ):
-            match = self[self.hashes[value.hash]]
+        # Check if the data matches an existing entry
+        if match_name := self._get_data_match(name, value):
+            match = self[match_name]
             self.logger.warning(
                 "[%s] Hash matches existing entry: %s"
                 % (value.header.name, match.header.name)
@@ -65,13 +62,36 @@ class CPIOArchive(dict, Loggified):
             value.header.ino = match.header.ino
             # run setitem again to handle the duplicate inode as a hardlink
             self[name] = value
-        else:
-            # Add the name to the hash table
-            self.hashes[value.hash] = name
 
         super().__setitem__(name, value)
         self._update_nlinks(value.header.ino)
 
+    def _get_data_match(self, name, value):
+        """
+        Get the name of an existing entry with the same data, if any.
+        Entries are only hashed once another entry with the same size is added,
+        so archives without duplicate sizes are never hashed.
+        """
+        # Use the header filesize, so lazy data isn't read
+        size = value.header.filesize_i
+        if not size or isinstance(value, CPIO_Symlink):
+            return None
+
+        if size not in self.sizes:
+            # No other entry has this size, the data can't match
+            self.sizes[size] = [name]
+            return None
+
+        # Hash the entries which were added before their size was matched
+        for pending_name in self.sizes[size]:
+            self.hashes.setdefault(self[pending_name].hash, pending_name)
+        self.sizes[size] = []
+
+        if match_name := self.hashes.get(value.hash):
+            return match_name
+        # Add the name to the hash table
+        self.hashes[value.hash] = name
+
     def _update_nlinks(self, inode):
         """Update nlinks for all entries with the same inode"""
         # Get the number of links based on the number of entries with that inode
@@ -90,6 +110,7 @@ class CPIOArchive(dict, Loggified):
         self.structure = structure
         self.inodes = {}
         self.hashes = {}
+        self.sizes = {}
 
     def update(self, other):
         """Update the archive with the values from another archive."""
@@ -101,28 +122,41 @@ class CPIOArchive(dict, Loggified):
         if normalized_name not in self:
             raise KeyError("Entry does not exist: %s" % name)
 
-        siblings = self.inodes[self[normalized_name].header.ino]
-        if len(siblings) > 1 and self[normalized_name].data != b"":
-            # Get the data associated with this inode
+        entry = self[normalized_name]
+        size = entry.header.filesize_i
+        # Entry which holds the data once this one is removed, if it is a hardlink
+        owner = None
+        siblings = self.inodes[entry.header.ino]
+        if len(siblings) > 1 and size:
+            # Get the data associated with this inode, lazy data is only read once
             for sibling_name in siblings:
-                if self[sibling_name].data:
+                if self[sibling_name].header.filesize_i:
                     data = self[sibling_name].data
                     break
             else:
-                raise RuntimeError(
-                    "No data found for inode: %s" % self[normalized_name].header.ino
-                )
+                raise RuntimeError("No data found for inode: %s" % entry.header.ino)
 
             # Remove the name from the inode list
             siblings.remove(normalized_name)
-            self[siblings[0]].data = data
-            self.logger.info(
-                "[%s] Moved entry data to: %s" % (normalized_name, siblings[0])
-            )
-            # Remove the name from the hash list
-            del self.hashes[self[normalized_name].hash]
+            owner = siblings[0]
+            self[owner].data = data
+            # The data is the same, so is its hash
+            self[owner]._hash = entry._hash
+            self.logger.info("[%s] Moved entry data to: %s" % (normalized_name, owner))
             # Update the nlink value for all entries with that inode
-            self._update_nlinks(self[normalized_name].header.ino)
+            self._update_nlinks(entry.header.ino)
+
+        # Hand the entry's place in the size and hash lists to the new owner, or remove it
+        if normalized_name in self.sizes.get(size, []):
+            self.sizes[size].remove(normalized_name)
+            if owner:
+                self.sizes[size].append(owner)
+        # Only hashed entries can be in the hash list
+        if entry._hash is not None and self.hashes.get(entry._hash) == normalized_name:
+            if owner:
+                self.hashes[entry._hash] = owner
+            else:
+                del self.hashes[entry._hash]
 
         return super().pop(normalized_name)
 
@@ -9,6 +9,8 @@ class CPIO_CharDev(CPIOData):
     """
     Character device object
     """
+    __slots__ = ()
+
     def __str__(self):
         return f"{super().__str__()}({int(self.header.rdevmajor)}, {int(self.header.rdevminor)})"
 
@@ -18,9 +20,9 @@ class CPIO_CharDev(CPIOData):
             raise ValueError("rdevmajor must be set")
         if not getattr(self.header, "rdevminor", None):
             raise ValueError("rdevminor must be set")
-        if int(self.header.mode, 16) & 0o777 == 0:
+        if self.header.mode_i & 0o777 == 0:
             self.logger.debug("Setting mode to 644")
-            self.header.mode = (int(self.header.mode, 16) & 0o7777000) | (0o644)
+            self.header.mode_i = (self.header.mode_i & 0o7777000) | (0o644)
 
     def __bytes__(self):
         """ Just return the header """
@@ -3,12 +3,19 @@ CPIO data objects
 """
 
 from hashlib import sha256
+from io import IOBase
+from operator import attrgetter
+from os import scandir, stat_result
 from pathlib import Path
+from stat import S_ISLNK
 from typing import Iterator, Unpack
 
 from ..common import Logged
 from ..header import CPIOHeader, CPIOHeaderKwargs
-from ..masks import CPIOModes, mode_bytes_from_path
+from ..masks import CPIOModes, mode_bytes_from_stat
+
+# Maps mode types to their CPIOData subclass, filled on first use
+_SUBTYPES: dict[CPIOModes, type["CPIOData"]] = {}
 
 
 class CPIODataKwargs(CPIOHeaderKwargs, total=False):
@@ -16,6 +23,10 @@ class CPIODataKwargs(CPIOHeaderKwargs, total=False):
     mode: CPIOModes
     header: CPIOHeader
     data: bytes
+    stat: stat_result
+    lazy: bool
+    source_offset: int
+    resolve: bool
 
 
 class CPIOData(Logged):
@@ -23,17 +34,41 @@ class CPIOData(Logged):
     Generic object for CPIO data.
     """
 
+    __slots__ = ("header", "_data", "_hash")
+
     header: CPIOHeader
     """header"""
-    data: bytes
-    """"content"""
-    hash: str
-    """sha256 hash of the data"""
 
     @property
     def name(self):
         return self.header.name
 
+    @property
+    def data(self) -> bytes:
+        """content"""
+        return self._data
+
+    @data.setter
+    def data(self, value: bytes):
+        """Set the data, making sure the header filesize matches the data length"""
+        self._data = value
+        # Invalidate the hash, it is recomputed when read
+        self._hash = None
+        self.header.filesize = len(value)
+
+    @property
+    def lazy(self) -> bool:
+        """True if the data is read from its source when used, instead of held in memory"""
+        return self._data is None
+
+    @property
+    def hash(self) -> bytes:
+        """sha256 digest of the data, computed when first read"""
+        # Cached by hand, cached_property serializes all instances behind one lock
+        if self._hash is None and (data := self.data):
+            self._hash = sha256(data).digest()
+        return self._hash
+
     @staticmethod
     def from_dir(
         path: Path, parent=None, relative=None, *args, **kwargs: Unpack[CPIODataKwargs]
@@ -61,33 +96,39 @@ class CPIOData(Logged):
         else:
             kwargs["name"] = str(path)
 
+        # The root and relative paths are resolved, and so are their children, unless they are symlinks
+        kwargs["resolve"] = False
         yield CPIOData.from_path(path=path, relative=relative, *args, **kwargs)
-        for child in path.iterdir():
+        # Walk the tree with a stack instead of recursing, directories are still yielded before their contents.
+        # Each directory's entries are pushed sorted by name in reverse, so they are popped in name order
+        # and the archive doesn't depend on the order the filesystem lists them in.
+        with scandir(path) as children:
+            stack = sorted(children, key=attrgetter("name"), reverse=True)
+        while stack:
+            # DirEntry types come from the directory read, so they don't need to be stat'd
+            child = stack.pop()
             if parent:
-                child_path = parent / child
+                child_path = parent / child.path
             else:
-                child_path = child
+                child_path = Path(child.path)
 
             if relative:
                 kwargs["name"] = str(child_path.relative_to(relative))
             else:
                 kwargs["name"] = str(child_path)
 
-            if child.is_dir() and not child.is_symlink():
-                yield from CPIOData.from_dir(
-                    path=child_path,
-                    parent=parent,
-                    relative=relative,
-                    *args,
-                    **kwargs,
-                )
+            yield CPIOData.from_path(
+                path=child_path,
+                relative=relative,
+                stat=child.stat(follow_symlinks=False),
+                *args,
+                **kwargs,
+            )
 
-            else:
-                yield (
-                    CPIOData.from_path(
-                        path=child_path, relative=relative, *args, **kwargs
-                    )
-                )
+            # Symlinks to directories are added as symlinks, not followed
+            if child.is_dir(follow_symlinks=False):
+                with scandir(child_path) as children:
+                    stack.extend(sorted(children, key=attrgetter("name"), reverse=True))
 
     @staticmethod
     def from_path(
@@ -102,22 +143,34 @@ class CPIOData(Logged):
         The name will be changed to be relative to the relative path, if provided.
 
         If absolute is set, the path is _allowed_ to be absolute, otherwise, the leading slash will be stripped.
+
+        If resolve is False, the path and relative path are used as given, they must already be resolved.
         """
         from pycpio.header import CPIOHeader
 
         path = Path(path)
         if logger := kwargs.get("logger"):
-            logger.debug(f"Creating CPIO entry from path: {path}")
+            logger.debug("Creating CPIO entry from path: %s", path)
 
-        relative = Path(relative).resolve() if relative else None
+        resolve = kwargs.pop("resolve", True)
+        if relative:
+            relative = Path(relative).resolve() if resolve else Path(relative)
+        else:
+            relative = None
         if logger := kwargs.get("logger"):
             logger.debug("Creating CPIO entry relative to path: %s", relative)
 
+        # Stat the path once, without following symlinks, and reuse the result
+        try:
+            stat = kwargs.pop("stat", None) or path.lstat()
+        except FileNotFoundError:
+            raise ValueError("Path does not exist: %s" % path)
+
         # Unless the path is a symlink, resolve it
-        if not path.is_symlink():
+        if resolve and not S_ISLNK(stat.st_mode):
             path = path.resolve()
-            if not path.exists():
-                raise ValueError("Path does not exist: %s" % path)
+
+        kwargs["stat"] = stat
 
         kwargs["path"] = path
         # If a name is provided, use it, otherwise, use the path, if relative is provided, use the relative path
@@ -133,16 +186,16 @@ class CPIOData(Logged):
             kwargs["name"] = kwargs["name"].lstrip("/")
 
         # Get the inode number from the path
-        kwargs["ino"] = path.stat().st_ino
+        kwargs["ino"] = stat.st_ino
 
         # Get the mode type from the supplied path
-        kwargs["mode"] = mode_bytes_from_path(path)
+        kwargs["mode"] = mode_bytes_from_stat(stat)
 
         header = CPIOHeader(*args, **kwargs)
         data = CPIOData.get_subtype(b"", header, *args, **kwargs)
 
         if logger := kwargs.get("logger"):
-            logger.debug(f"Created CPIO entry from path: {data}")
+            logger.debug("Created CPIO entry from path: %s", data)
 
         return data
 
@@ -157,7 +210,7 @@ class CPIOData(Logged):
         from pycpio.header import CPIOHeader
 
         if logger := kwargs.get("logger"):
-            logger.debug(f"Creating CPIO entry: {name}")
+            logger.debug("Creating CPIO entry: %s", name)
 
         kwargs["mtime"] = kwargs.pop("mtime", time())
         kwargs["header"] = kwargs.pop("header", CPIOHeader(name=name, *args, **kwargs))
@@ -174,11 +227,21 @@ class CPIOData(Logged):
         data: bytes, header: CPIOHeader, *args, **kwargs: Unpack[CPIODataKwargs]
     ):
         """Get the appropriate subtype for the data based on the header mode type."""
-        # Imports must be here so the module can be imported
-        from .chardev import CPIO_CharDev
-        from .dir import CPIO_Dir
-        from .file import CPIO_File
-        from .symlink import CPIO_Symlink
+        if not _SUBTYPES:
+            # Imports must be here so the module can be imported
+            from .chardev import CPIO_CharDev
+            from .dir import CPIO_Dir
+            from .file import CPIO_File
+            from .symlink import CPIO_Symlink
+
+            _SUBTYPES.update(
+                {
+                    CPIOModes.File: CPIO_File,
+                    CPIOModes.Symlink: CPIO_Symlink,
+                    CPIOModes.CharDev: CPIO_CharDev,
+                    CPIOModes.Dir: CPIO_Dir,
+                }
+            )
 
         mode = header.mode_type
         logger = header.logger
@@ -191,36 +254,31 @@ class CPIOData(Logged):
             # Return the base type for the trailer
             return CPIOData(*args, **kwargs)
 
-        match mode.name:
-            case "File":
-                return CPIO_File(*args, **kwargs)
-            case "Symlink":
-                return CPIO_Symlink(*args, **kwargs)
-            case "CharDev":
-                return CPIO_CharDev(*args, **kwargs)
-            case "Dir":
-                return CPIO_Dir(*args, **kwargs)
-            case _:
-                raise NotImplementedError(f"Unknown mode type: {mode.name}")
-
-    def __setattr__(self, name: str, value: object):
-        """Setattr, mostly for making sure the header filesize matches the data length"""
-        super().__setattr__(name, value)
-        if name == "data":
-            if value:
-                self.hash = sha256(value).hexdigest()
-            self.header.filesize = len(value)
+        if subtype := _SUBTYPES.get(mode):
+            return subtype(*args, **kwargs)
+        raise NotImplementedError(f"Unknown mode type: {mode.name}")
 
     def __init__(self, data: bytes, header, *args, **kwargs):
+        super().__init__(**kwargs)
         self.header = header
-        self.hash = None
-        self.data = data if data is not None else b""
+        if data is None and kwargs.get("lazy"):
+            # The subtype loads the data from its source, the header filesize is kept
+            self._data = self._hash = None
+        else:
+            self.data = data if data is not None else b""
 
     def __str__(self):
         out_str = f"{self.__class__.__name__} {self.header}"
-        out_str += f"\nSHA256: {self.hash} " if self.hash else " "
+        # Only show the hash if it was already computed
+        out_str += f"\nSHA256: {self._hash.hex()} " if self._hash else " "
         return out_str
 
     def __bytes__(self):
-        """Convert the data to bytes"""
+        """Convert the data to bytes, lazy data is read from its source"""
         return bytes(self.header) + self.data
+
+    def write_data(self, stream: IOBase) -> int:
+        """Write the data to the stream, returns the number of bytes written."""
+        if data := self.data:
+            stream.write(data)
+        return len(data)
@@ -12,12 +12,14 @@ class CPIO_Dir(CPIOData):
     Directory object
     """
 
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs: Unpack[CPIODataKwargs]):
         super().__init__(*args, **kwargs)
         if path := kwargs.pop("path", None):
-            path = path.resolve()
-            self.header.mode = int(self.header.mode, 16) | (path.stat().st_mode & 0o777)
-            self.header.mtime = path.resolve().stat().st_mtime
+            stat = kwargs.pop("stat", None) or path.stat()
+            self.header.mode_i |= stat.st_mode & 0o777
+            self.header.mtime = stat.st_mtime
             if path.is_absolute():
                 self.header.name = str(path.relative_to(path.anchor))
 
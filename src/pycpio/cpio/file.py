@@ -2,27 +2,139 @@
 CPIO file object
 """
 
+import os
+from hashlib import file_digest, sha256
+from io import FileIO, IOBase
+from pathlib import Path
 from typing import Unpack
 
 from .data import CPIOData, CPIODataKwargs
 
+# Size of the chunks used to copy lazy file data
+COPY_CHUNK_SIZE = 1 << 20
+# sendfile is not available on every platform, lazy data is copied in chunks without it
+sendfile = getattr(os, "sendfile", None)
+
 
 class CPIO_File(CPIOData):
     """
     Standard file object
+
+    If created with lazy set, only the path is kept and the data is read from it when needed.
+    If source_offset is set, the data starts at that offset in the path, like a file in an archive being read.
     """
 
+    __slots__ = ("path", "source_offset")
+
+    path: Path
+    """path the data is read from, if lazy"""
+    source_offset: int
+    """offset of the data in the path"""
+
+    @CPIOData.data.getter
+    def data(self) -> bytes:
+        """
+        The file content, read from the path if it was not loaded.
+        Lazy files are read on every access, so the data isn't held,
+        write_data() and hash read them in chunks instead.
+        """
+        if self._data is None:
+            with self._open() as f:
+                return f.read(self.header.filesize_i)
+        return self._data
+
+    @property
+    def hash(self) -> bytes:
+        """sha256 digest of the data, lazy files are hashed in chunks"""
+        if self._data is None and self._hash is None and self.header.filesize_i:
+            with self._open() as f:
+                if not self.source_offset:
+                    self._hash = file_digest(f, "sha256").digest()
+                else:
+                    # Only hash the data, not the rest of the source file
+                    digest = sha256()
+                    size = self.header.filesize_i
+                    while size:
+                        chunk = f.read(min(size, COPY_CHUNK_SIZE))
+                        if not chunk:
+                            raise ValueError("[%s] File is smaller than its header filesize" % self.name)
+                        digest.update(chunk)
+                        size -= len(chunk)
+                    self._hash = digest.digest()
+        return super().hash
+
+    def _open(self) -> IOBase:
+        """Open the path, positioned at the start of the data."""
+        f = self.path.open("rb")
+        if self.source_offset:
+            f.seek(self.source_offset)
+        return f
+
+    def write_data(self, stream: IOBase) -> int:
+        """Write the data to the stream, lazy files are copied in chunks."""
+        if self._data is not None:
+            return super().write_data(stream)
+
+        with self._open() as f:
+            # Only copy in the kernel for plain files, wrapped streams may transform the data
+            if sendfile and isinstance(getattr(stream, "raw", stream), FileIO):
+                self._sendfile(f, stream)
+            else:
+                self._copy(f, stream, self.header.filesize_i)
+        return self.header.filesize_i
+
+    def _sendfile(self, f: IOBase, stream: IOBase) -> None:
+        """Copy the data from f to the stream with sendfile, falling back to a copy if it's not supported."""
+        # Anything buffered must be written before the data is sent to the file descriptor
+        stream.flush()
+        size = self.header.filesize_i
+        offset = 0
+        while offset < size:
+            try:
+                sent = sendfile(
+                    stream.fileno(), f.fileno(), self.source_offset + offset, size - offset
+                )
+            except OSError as e:
+                if offset:
+                    raise e
+                self.logger.debug("[%s] sendfile failed, copying data: %s", self.name, e)
+                return self._copy(f, stream, size)
+            if not sent:
+                raise ValueError("[%s] File is smaller than its header filesize" % self.name)
+            offset += sent
+
+    def _copy(self, f: IOBase, stream: IOBase, size: int) -> None:
+        """Copy size bytes from f to the stream in chunks."""
+        while size:
+            chunk = f.read(min(size, COPY_CHUNK_SIZE))
+            if not chunk:
+                raise ValueError("[%s] File is smaller than its header filesize" % self.name)
+            stream.write(chunk)
+            size -= len(chunk)
+
     def __str__(self):
-        return f"{super().__str__()}({len(self.data)} bytes)"
+        return f"{super().__str__()}({self.header.filesize_i} bytes)"
 
     def __init__(self, *args, **kwargs: Unpack[CPIODataKwargs]):
+        self.path = None
+        self.source_offset = 0
         super().__init__(*args, **kwargs)
-        if path := kwargs.pop("path", None):
-            path = path.resolve()
-            with path.open("rb") as f:
-                self.data = f.read()
-            self.header.filesize = format(len(self.data), "08x").encode("ascii")
-            self.header.mtime = path.resolve().stat().st_mtime
-            self.header.mode = int(self.header.mode, 16) | (path.stat().st_mode & 0o777)
+        if self._data is None:
+            # Created lazily from a header, the data is read from the source path
+            self.path = kwargs["path"]
+            self.source_offset = kwargs.get("source_offset", 0)
+        elif path := kwargs.pop("path", None):
+            stat = kwargs.pop("stat", None) or path.stat()
+            if kwargs.get("lazy"):
+                # Keep the path, the data is read when it is used
+                self.path = path
+                self._data = None
+                self.header.filesize = stat.st_size
+            else:
+                with path.open("rb") as f:
+                    self.data = f.read()
+                self.header.filesize = format(len(self.data), "08x").encode("ascii")
+            self.header.mtime = stat.st_mtime
+            self.header.mode_i |= stat.st_mode & 0o777
             if not kwargs.get("name") and path.is_absolute():
                 self.header.name = str(path.relative_to(path.anchor))
@@ -9,21 +9,22 @@ class CPIO_Symlink(CPIOData):
     """
     Symbolic link object
     """
-    def __setattr__(self, key, value):
-        if key == 'data':
-            if isinstance(value, str):
-                value = value.encode('ascii')
-            elif isinstance(value, bytes):
-                pass
-            else:
-                raise ValueError("data must be a string or bytes")
+    __slots__ = ()
 
-            if value and value[-1] != 0:
-                value += b'\0'
+    @CPIOData.data.setter
+    def data(self, value):
+        """Set the link target, from a string or bytes, with a trailing null byte"""
+        if isinstance(value, str):
+            value = value.encode('ascii')
+        elif isinstance(value, bytes):
+            pass
+        else:
+            raise ValueError("data must be a string or bytes")
 
-            self.header.filesize = format(len(value), '08x').encode('ascii')
+        if value and value[-1] != 0:
+            value += b'\0'
 
-        super().__setattr__(key, value)
+        CPIOData.data.fset(self, value)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -32,7 +33,9 @@ class CPIO_Symlink(CPIOData):
             if kwargs.get('recursive', False):
                 symlink_path = symlink_path.lstrip('/')
             self.data = symlink_path.encode('ascii')
-            self.header.mtime = path.stat().st_mtime
+            # Use the stat of the link itself, not its target
+            stat = kwargs.pop('stat', None) or path.lstat()
+            self.header.mtime = stat.st_mtime
         elif self.data is None:
             raise ValueError("path must be specified for symlinks")
 
@@ -1,10 +1,17 @@
 from .cpioheader import CPIOHeader, CPIOHeaderKwargs
-from .header_funcs import get_header_from_magic, get_magic_from_header
+from .header_funcs import (
+    get_header_from_magic,
+    get_header_packer,
+    get_header_struct,
+    get_magic_from_header,
+)
 from .headers import HEADER_NEW
 
 __all__ = [
     "CPIOHeader",
     "get_header_from_magic",
+    "get_header_packer",
+    "get_header_struct",
     "get_magic_from_header",
     "HEADER_NEW",
     "CPIOHeaderKwargs",
@@ -31,6 +31,9 @@ class CPIOHeader(Logged):
     uid: int
     gid: int
     ino: int
+    namesize_i: int
+    filesize_i: int
+    mode_i: int
 
     def __init__(
         self, header_data=b"", overrides={}, *args, **kwargs: Unpack[CPIOHeaderKwargs]
@@ -67,7 +70,11 @@ class CPIOHeader(Logged):
 
         self.magic = get_magic_from_header(self.structure)
 
-    def from_bytes(self, data: bytes) -> None:
+    def from_bytes(self, data: bytes | memoryview) -> None:
+        """
+        Initialize the object from header data.
+        The data is wrapped in a memoryview so fields can be sliced without copying.
+        """
         if hasattr(self, "data"):
             raise ValueError("CPIOEntry already initialized")
 
@@ -76,7 +83,7 @@ class CPIOHeader(Logged):
                 "CPIO header must be 110 bytes, got length: %s" % len(data)
             )
 
-        self.data = data
+        self.data = memoryview(data)
         self.offset = 0  # Current offset in the data
 
         # Header processing
@@ -84,18 +91,23 @@ class CPIOHeader(Logged):
 
     def __setattr__(self, key: str, value):
         """
-        If the key is in the structure, set the value to the bytes representation.
+        If the key is in the structure, set the value to the bytes representation,
+        and cache the integer value under the key with an "_i" suffix.
+        Setting the "_i" attribute sets the field from the integer.
         If the filesize changes, log a warning.
         Check the mode and set the mode_type and permissions attributes accordingly.
         If setting the name, add a null byte to the end and set the namesize attribute.
         """
+        if key.endswith("_i") and key[:-2] in getattr(self, "structure", ()):
+            return setattr(self, key[:-2], value)
+
         if (
             hasattr(self, "structure")
             and key in self.structure
             and not isinstance(value, bytes)
         ):
             length = self.structure[key]
-            self.logger.debug("Converting %s to bytes: %s" % (key, value))
+            self.logger.debug("Converting %s to bytes: %s", key, value)
             if isinstance(value, str):
                 value = format(int(value, 16), f"0{length}x")
             elif isinstance(value, float):
@@ -105,7 +117,7 @@ class CPIOHeader(Logged):
             else:
                 raise ValueError("Unable to convert %s to bytes: %s" % (key, value))
             value = value.encode("ascii")
-            self.logger.debug("[%s] %d bytes: %s" % (key, length, value))
+            self.logger.debug("[%s] %d bytes: %s", key, length, value)
 
         if key == "filesize" and value != b"00000000":
             if getattr(self, "filesize", b"00000000") not in [value, b"00000000"]:
@@ -119,6 +131,10 @@ class CPIOHeader(Logged):
 
         super().__setattr__(key, value)
 
+        if hasattr(self, "structure") and key in self.structure:
+            # Parse the hex once, so readers can use the integer value
+            super().__setattr__(f"{key}_i", int(value, 16))
+
         if key == "mode":
             try:
                 self.mode_type = resolve_mode_bytes(self.mode)
@@ -137,7 +153,7 @@ class CPIOHeader(Logged):
             namesize = len(value) + 1
             if hasattr(self, "namesize") and namesize != int(self.namesize, 16):
                 self.logger.debug(
-                    "Name size changed: %s -> %s" % (int(self.namesize, 16), namesize)
+                    "Name size changed: %s -> %s", int(self.namesize, 16), namesize
                 )
             self.namesize = namesize
 
@@ -146,41 +162,42 @@ class CPIOHeader(Logged):
         for attribute in self.structure:
             if attribute in overrides:
                 self.logger.log(
-                    5, "[%s] Pre-override: %s" % (attribute, getattr(self, attribute))
+                    5, "[%s] Pre-override: %s", attribute, getattr(self, attribute)
                 )
                 if attribute == "mode":
                     # Mask the mode, then add the override
-                    value = (int(self.mode, 16) & 0o7777000) | (
+                    value = (self.mode_i & 0o7777000) | (
                         overrides[attribute] & 0o777
                     )
                 else:
                     value = overrides[attribute]
-                self.logger.debug("[%s] Setting override: %s" % (attribute, value))
+                self.logger.debug("[%s] Setting override: %s", attribute, value)
                 setattr(self, attribute, value)
 
-    def _read_bytes(self, num_bytes: int) -> bytes:
-        """Read the specified number of bytes from the data, incrementing the offset, then returning the data."""
+    def _read_bytes(self, num_bytes: int) -> memoryview:
+        """Read the specified number of bytes from the data, incrementing the offset, then returning a view of the data."""
         data = self.data[self.offset : self.offset + num_bytes]
         self.offset += num_bytes
         return data
 
-    def add_data(self, data: bytes) -> None:
+    def add_data(self, data: bytes | memoryview) -> None:
         """Add the file data to the object."""
-        self.logger.debug("Adding data: %s" % data)
-        self.data += data
+        self.logger.debug("Adding data: %s", data)
+        self.data = memoryview(b"".join((self.data, data)))
 
     def parse_header(self):
         """
         Parse the data according to the structure.
         Sets attributes on the object.
         """
-        from .header_funcs import get_header_from_magic
+        from .header_funcs import get_header_from_magic, get_header_struct
 
         self.structure = get_header_from_magic(self.data[:6])
-        for key, length in self.structure.items():
-            # Read the data, convert to int
-            data = self._read_bytes(length)
-
+        # Unpack all fields at once, the struct is cached for the structure
+        header_struct = get_header_struct(self.structure)
+        fields = header_struct.unpack_from(self.data, self.offset)
+        self.offset += header_struct.size
+        for key, data in zip(self.structure, fields):
             if key == "check" and data != b"0" * 8:
                 raise ValueError("Invalid check: %s" % data)
             else:
@@ -189,26 +206,32 @@ class CPIOHeader(Logged):
 
     def get_name(self):
         """Get the name of the file."""
-        name = self._read_bytes(int(self.namesize, 16)).decode("ascii").rstrip("\0")
+        name = str(self._read_bytes(self.namesize_i), "ascii").rstrip("\0")
 
         if not name:
             raise ValueError("Empty name")
         self.name = name
 
+    def pack_into(self, buffer: bytearray) -> int:
+        """
+        Appends the bytes representation of the object to the buffer.
+        Returns the number of bytes added.
+        """
+        start = len(buffer)
+        # The fields are stored as bytes, so they can be joined in a single call
+        buffer += b"".join(map(self.__getattribute__, self.structure))
+        # Output the name as bytes, the null byte is added along with the padding
+        buffer += self.name.encode("ascii")
+        # Pad the header and name to 4 bytes, same as pad_cpio
+        buffer += b"\0" * (1 + ((start - len(buffer) - 1) & 3))
+
+        return len(buffer) - start
+
     def __bytes__(self):
         """Returns the bytes representation of the object."""
-        from pycpio.cpio import pad_cpio
-
-        out_bytes = b""
-        # Get the bytes for each attribute
-        for attr, value in self.structure.items():
-            out_bytes += getattr(self, attr)
-        # Output the name as bytes, with a null byte
-        out_bytes += self.name.encode("ascii") + b"\0"
-        # Calculate padding based on total length
-        out_bytes += b"\0" * pad_cpio(len(out_bytes))
-
-        return out_bytes
+        out_bytes = bytearray()
+        self.pack_into(out_bytes)
+        return bytes(out_bytes)
 
     def __str__(self):
         """Returns a string representation of the object."""
@@ -2,9 +2,14 @@
 CPIO header definitions and parsing.
 """
 
+from operator import attrgetter
+from struct import Struct
+
 from .headers import HEADER_NEW
 
 lookup_table = {b"070701": HEADER_NEW}
+struct_cache = {}
+packer_cache = {}
 
 
 def get_header_from_magic(magic: bytes) -> dict:
@@ -25,3 +30,39 @@ def get_magic_from_header(header: dict) -> bytes:
         if header_type == header:
             return magic
     raise ValueError("Unknown header type: %s" % header)
+
+
+def get_header_struct(header: dict) -> Struct:
+    """
+    Return a Struct which unpacks the fields of the given header format as bytes.
+    """
+    key = tuple(header.items())
+    if key not in struct_cache:
+        struct_cache[key] = Struct("".join(f"{length}s" for length in header.values()))
+    return struct_cache[key]
+
+
+def get_header_packer(header: dict):
+    """
+    Return a function which appends a CPIOHeader of the given header format to a buffer,
+    returning the number of bytes added. The field order and header size are bound once.
+    """
+    key = tuple(header.items())
+    if key in packer_cache:
+        return packer_cache[key]
+
+    get_fields = attrgetter(*header)
+    header_size = sum(header.values())
+    # The name is followed by a null byte, then padded to 4 bytes
+    name_pads = [b"\0" * (1 + ((-header_size - namesize) & 3)) for namesize in range(1, 5)]
+
+    def pack_header(cpio_header, buffer: bytearray) -> int:
+        name = cpio_header.name.encode("ascii")
+        pad = name_pads[len(name) & 3]
+        buffer += b"".join(get_fields(cpio_header))
+        buffer += name
+        buffer += pad
+        return header_size + len(name) + len(pad)
+
+    packer_cache[key] = pack_header
+    return pack_header
@@ -3,7 +3,9 @@ CPIO header mode masks.
 """
 
 from enum import Enum
+from os import stat_result
 from pathlib import Path
+from stat import S_ISBLK, S_ISCHR, S_ISDIR, S_ISFIFO, S_ISLNK, S_ISREG
 
 
 class CPIOModes(Enum):
@@ -55,11 +57,23 @@ def mode_bytes_from_path(file_path: Path) -> CPIOModes:
     raise ValueError(f"Invalid mode: {file_path}")
 
 
+def mode_bytes_from_stat(file_stat: stat_result) -> CPIOModes:
+    """
+    Gets the mode type bytes from the given stat result.
+    Symlinks are only detected if the stat result did not follow them.
+    """
+    mode = file_stat.st_mode
+    if S_ISLNK(mode):
+        return CPIOModes.Symlink.value
+    elif S_ISDIR(mode):
+        return CPIOModes.Dir.value
+    elif S_ISBLK(mode):
+        return CPIOModes.BlkDev.value
+    elif S_ISCHR(mode):
+        return CPIOModes.CharDev.value
+    elif S_ISFIFO(mode):
+        return CPIOModes.FIFO.value
+    elif S_ISREG(mode):
+        return CPIOModes.File.value
 
-
-
-
-
-
-
-
+    raise ValueError(f"Invalid mode: {mode}")
@@ -1,4 +1,8 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from io import IOBase
+from operator import attrgetter
+from os import cpu_count
 from pathlib import Path
 from typing import Union
 
@@ -39,7 +43,11 @@ class PyCPIO(Logged):
         self.entries.add_entry(CPIOData.from_path(**kwargs))
 
     def append_recursive(self, path: Path, **kwargs):
-        """Appends all files under a directory into the CPIO archive."""
+        """
+        Appends all files under a directory into the CPIO archive.
+        Files are added lazily unless lazy=False is passed, so their data is only read when written.
+        """
+        kwargs.setdefault("lazy", True)
         kwargs.update(
             {
                 "path": path,
@@ -48,7 +56,21 @@ class PyCPIO(Logged):
                 "logger": self.logger,
             }
         )
-        for data in CPIOData.from_dir(**kwargs):
+        entries = list(CPIOData.from_dir(**kwargs))
+        # The archive only hashes entries which share their size with another entry
+        sizes = Counter(data.header.filesize_i for data in entries)
+        sizes.update(self.entries.sizes.keys())
+        to_hash = [
+            data
+            for data in entries
+            if data.header.filesize_i and sizes[data.header.filesize_i] > 1
+        ]
+        # hashlib releases the GIL while hashing, so entries can be hashed in parallel
+        with ThreadPoolExecutor(max_workers=cpu_count()) as executor:
+            for _ in executor.map(attrgetter("hash"), to_hash):
+                pass
+
+        for data in entries:
             self.entries.add_entry(data)
 
     def remove_cpio(self, name: str):
@@ -72,22 +94,27 @@ class PyCPIO(Logged):
             **kwargs,
         )
 
-    def read_from_stream(self, stream: IOBase, stop_at_trailer=True):
+    def read_from_stream(self, stream: IOBase, stop_at_trailer=True, lazy=False):
         """Processes a CPIO archive."""
-        reader = CPIOReader(stream, self.overrides, logger=self.logger)
+        reader = CPIOReader(stream, self.overrides, lazy=lazy, logger=self.logger)
         for cpio_entry in reader.read_entry(stop_at_trailer):
             self.entries.add_entry(cpio_entry)
 
-    def read_cpio_file(self, file_path: Path, stop_at_trailer=True):
-        """Creates a CPIOReader object and reads the file."""
+    def read_cpio_file(self, file_path: Path, stop_at_trailer=True, lazy=False):
+        """
+        Creates a CPIOReader object and reads the file.
+        If lazy is set, file data stays in the archive and is copied from it when written,
+        so the archive must not be changed while the entries are used.
+        """
         with Path(file_path).open("rb") as fp:
-            self.read_from_stream(fp, stop_at_trailer)
+            self.read_from_stream(fp, stop_at_trailer, lazy)
 
     def write_cpio_file(self, file_path: Union[Path, str], **kwargs):
         """Writes a CPIO archive to file."""
         kwargs.update({"structure": self.structure, "logger": self.logger})
-        with Path(file_path).open("wb") as fp:
-            self.write_to_stream(fp, **kwargs)
+        # The writer buffers the file, and closes it along with the archive
+        with CPIOWriter.from_path(file_path, **kwargs) as writer:
+            writer.write(self.entries)
 
     def write_to_stream(self, fp: IOBase, **kwargs):
         writer = CPIOWriter(fp, **kwargs)
@@ -96,7 +123,7 @@ class PyCPIO(Logged):
 
     def list_files(self):
         """Returns a list of files in the CPIO archive."""
-        return "\n".join([name for name in self.entries.keys()])
+        return "\n".join(self.entries)
 
     def _build_cpio_entry(
         self, name: str, entry_type: CPIOModes, data=None, *args, **kwargs
@@ -105,7 +132,7 @@ class PyCPIO(Logged):
         overrides = self.overrides.copy()
         if mode := kwargs.pop("mode", None):
             overrides["mode"] = mode
-            self.logger.debug("Setting override: mode=%s" % mode)
+            self.logger.debug("Setting override: mode=%s", mode)
         kwargs = {
             "name": name,
             "structure": self.structure,
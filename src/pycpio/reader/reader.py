@@ -1,9 +1,11 @@
-from io import IOBase
+from io import SEEK_CUR, FileIO, IOBase
+from logging import DEBUG
 from pathlib import Path
 from typing import Union
 
 from pycpio.cpio import CPIOArchive, CPIOData, pad_cpio
 from pycpio.header import CPIOHeader
+from pycpio.masks import CPIOModes
 
 from ..common import Logged
 
@@ -11,44 +13,97 @@ from ..common import Logged
 class CPIOReader(Logged):
     """
     A class for reading CPIO archives.
+
+    If lazy is set and the stream is a file, file data is not read,
+    the entries read it from the archive path when needed.
     """
 
-    def __init__(self, stream: IOBase, overrides={}, **kwargs):
+    def __init__(self, stream: IOBase, overrides={}, lazy=False, **kwargs):
         super().__init__(**kwargs)
         self.stream = stream
+        # Path of the archive, which lazy entries read their data from
+        self.source = None
+        if lazy and isinstance(getattr(stream, "raw", stream), FileIO):
+            if isinstance(stream.name, str) and stream.seekable():
+                self.source = Path(stream.name).resolve()
         self.overrides = overrides
         self.entries = CPIOArchive(
             logger=self.logger,
         )
         self.offset = 0
-
-    def _read_bytes(self, num_bytes: int, pad=False) -> bytes:
-        """Reads num_bytes from self.raw_cpio, starting at self.offset."""
-        data: bytes = b""
-        read = 0
+        # Reused for every read, grown when an entry is larger than the buffer
+        self._buf = bytearray(1 << 16)
+        # Streams which only have read() are copied into the buffer
+        self._stream_readinto = getattr(stream, "readinto", None)
+
+    def _readinto(self, num_bytes: int, start=0) -> memoryview:
+        """Reads num_bytes from the stream into the read buffer at start, returning a view of the data."""
+        if start + num_bytes > len(self._buf):
+            self._buf.extend(b"\x00" * (start + num_bytes - len(self._buf)))
+
+        view = memoryview(self._buf)[start : start + num_bytes]
+        # Buffered streams usually fill the view in one call, only loop for short reads
+        read = self._fill(view) if num_bytes else 0
         while read < num_bytes:
-            data += self.stream.read(num_bytes - read)
-            _read = len(data)
+            _read = self._fill(view[read:])
             if not _read:
                 raise EOFError
-            read = _read
+            read += _read
         self.offset += read
-        if len(data) > 256:
-            self.logger.debug(
-                "Read %s bytes: %s...%s" % (num_bytes, data[:128], data[-128:])
-            )
-        else:
-            self.logger.debug("Read %s bytes: %s" % (num_bytes, data))
+        return view
+
+    def _fill(self, view: memoryview) -> int:
+        """Reads from the stream into the view, returning the number of bytes read."""
+        if self._stream_readinto:
+            # Non-blocking streams return None when no data is available
+            return self._stream_readinto(view) or 0
+
+        data = self.stream.read(len(view))
+        if not data:
+            return 0
+        view[: len(data)] = data
+        return len(data)
+
+    def _read_bytes(self, num_bytes: int, pad=False, copy=True) -> bytes | memoryview:
+        """
+        Reads num_bytes from the stream, starting at self.offset.
+        If copy is False, a view of the read buffer is returned, which is only valid until the next read.
+        If pad is set, the stream is advanced to the next 4 byte boundary.
+        """
+        if num_bytes + 3 > len(self._buf):
+            # Leave room for the padding, the buffer can't be resized while a view is held
+            self._buf.extend(b"\x00" * (num_bytes + 3 - len(self._buf)))
+        view = self._readinto(num_bytes)
+        data = bytes(view) if copy else view
+        # Slicing the data for the log message copies it, only do it when it will be logged
+        if self.logger.isEnabledFor(DEBUG):
+            if len(data) > 256:
+                self.logger.debug(
+                    "Read %s bytes: %s...%s",
+                    num_bytes,
+                    bytes(data[:128]),
+                    bytes(data[-128:]),
+                )
+            else:
+                self.logger.debug("Read %s bytes: %s", num_bytes, bytes(data))
 
         if pad:
-            pad_size = pad_cpio(read)
-            self.logger.debug("Padding offset by %s bytes" % pad_size)
+            pad_size = pad_cpio(self.offset)
+            self.logger.debug("Padding offset by %s bytes", pad_size)
+            if pad_size:
+                # Read the padding past the data, so views of the data stay valid
+                self._readinto(pad_size, start=num_bytes)
 
         return data
 
     def read_header(self) -> CPIOHeader:
         """Processes a single CPIO header from self.raw_cpio."""
         header_data = self._read_bytes(110)
+        # Skip zero padding, like the padding between concatenated archives, in 4 byte steps
+        while not any(header_data[:4]):
+            skip = (len(header_data) - len(header_data.lstrip(b"\x00"))) & ~3
+            self.logger.debug("Skipping %s bytes of padding at offset: %s", skip, self.offset)
+            header_data = header_data[skip:] + self._read_bytes(skip)
 
         try:
             header = CPIOHeader(header_data, self.overrides, logger=self.logger)
@@ -61,7 +116,7 @@ class CPIOReader(Logged):
             return
 
         # Get the filename now that we know the size
-        filename_data = self._read_bytes(int(header.namesize, 16), pad=True)
+        filename_data = self._read_bytes(header.namesize_i, pad=True, copy=False)
         header.add_data(filename_data)
         header.get_name()
 
@@ -72,26 +127,51 @@ class CPIOReader(Logged):
         return header
 
     def read_data(self, header: CPIOHeader | int):
-        datasize = header if isinstance(header, int) else int(header.filesize, 16)
+        datasize = header if isinstance(header, int) else header.filesize_i
         return self._read_bytes(datasize, pad=True)
 
+    def skip_data(self, header: CPIOHeader) -> None:
+        """Seeks past the data and padding for the header, without reading it."""
+        size = header.filesize_i
+        size += pad_cpio(self.offset + size)
+        self.stream.seek(size, SEEK_CUR)
+        self.offset += size
+
+    def _get_entry(self, header: CPIOHeader) -> CPIOData:
+        """Returns the entry for the header, reading its data."""
+        if self.source and header.mode_type == CPIOModes.File and header.filesize_i:
+            # Keep where the data is in the file, the stream may not have started at its start
+            source_offset = self.stream.tell()
+            self.skip_data(header)
+            return CPIOData.get_subtype(
+                data=None,
+                header=header,
+                path=self.source,
+                source_offset=source_offset,
+                lazy=True,
+            )
+        return CPIOData.get_subtype(
+            data=self.read_data(header),
+            header=header,
+        )
+
     def read_entry(self, stop_at_trailer=True):
         """Processes the file object self.cpio_file, yielding CPIOData objects."""
         trailer = False
         while True:
             try:
-                self.logger.debug("At offset: %s" % self.offset)
+                self.logger.debug("At offset: %s", self.offset)
                 if header := self.read_header():
                     trailer = False
-                    yield CPIOData.get_subtype(
-                        data=self.read_data(header),
-                        header=header,
-                    )
+                    yield self._get_entry(header)
                 elif stop_at_trailer:
                     break
+                else:
+                    trailer = True
             except EOFError:
                 if not trailer:
                     self.logger.warning("Reached end of file without finding trailer")
+                break
 
     def __next__(self):
         yield from self.read_entry(False)
@@ -1,65 +1,358 @@
-from io import IOBase
+import os
+from io import BufferedWriter, FileIO, IOBase, RawIOBase
+from logging import DEBUG
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from weakref import finalize
 from typing import Iterable, Mapping, Unpack
 
 from ..common import Logged, LoggedKwargs
-from ..cpio import pad_cpio
 from ..cpio.data import CPIOData, CPIODataKwargs
-from ..header import HEADER_NEW, CPIOHeader
+from ..header import HEADER_NEW, CPIOHeader, get_header_packer
 from ..masks import CPIOModes
 
+# Entries are aligned to 4 bytes, so only these paddings are ever needed
+_PADS = (b"", b"\x00", b"\x00\x00", b"\x00\x00\x00")
+# Batched entries are written once they reach this size, when the stream is written with writev
+FLUSH_BYTES = 64 << 20
+# Other streams don't save syscalls with larger batches, so they are flushed sooner
+STREAM_FLUSH_BYTES = 1 << 20
+# With async_write, batches are copies waiting in the queue, so they are kept smaller
+ASYNC_FLUSH_BYTES = 4 << 20
+ASYNC_QUEUE_SIZE = 8
+# Data this large is written directly, instead of being copied into the batch
+DIRECT_WRITE_SIZE = 1 << 20
+# Data smaller than this is cheaper to copy into the batch than to pass to writev
+VECTOR_MIN_SIZE = 1 << 12
+# The trailer is the same for every archive of a structure, so it is only packed once
+_TRAILERS: dict[tuple, bytes] = {}
+
+
+def _get_iov_max() -> int:
+    """Returns the limit of buffers per writev call, 1024 if the platform doesn't report one."""
+    try:
+        iov_max = os.sysconf("SC_IOV_MAX")
+    except (AttributeError, ValueError, OSError):
+        return 1024
+    return iov_max if iov_max > 0 else 1024
+
+
+IOV_MAX = _get_iov_max()
+
+
+def _write_worker(queue: Queue, errors: list) -> None:
+    """
+    Runs queued writes until None is queued, keeping the first error in errors.
+    Doesn't reference the writer, so a dropped writer can still be collected.
+    """
+    while (item := queue.get()) is not None:
+        if not errors:
+            try:
+                item[0](item[1])
+            except Exception as e:
+                errors.append(e)
+        # Don't hold the item while waiting for the next one
+        item = None
+        queue.task_done()
+    queue.task_done()
+
+
+def _stop_write_thread(queue: Queue, thread: Thread) -> None:
+    """Stops the write thread, after the queued writes are done."""
+    queue.put(None)
+    thread.join()
+
 
 class CPIOWriter(Logged):
     """
     Takes a list of CPIOData objects,
     writes them to the file specified by output_file.
+
+    With async_write, writes are done by a thread, so the writer must be closed,
+    or used as a context manager, for the last batch and trailer to be written.
     """
 
-    def __init__(self, stream: IOBase, structure=None, **kwargs: Unpack[LoggedKwargs]):
+    def __init__(
+        self,
+        stream: IOBase,
+        structure=None,
+        flush_bytes: int | None = None,
+        async_write=False,
+        **kwargs: Unpack[LoggedKwargs],
+    ):
         super().__init__(**kwargs)
+        # Raw streams make a syscall for every write, so they are wrapped in a buffer
+        self._owns_buffer = isinstance(stream, RawIOBase)
+        self._owns_stream = False
+        if self._owns_buffer:
+            stream = BufferedWriter(stream, buffer_size=1 << 20)
         self.stream = stream
         self.structure = structure if structure is not None else HEADER_NEW
+        # Headers using the writer structure are packed without per-entry dispatch
+        self._pack_header = get_header_packer(self.structure)
+        # Small entries are batched, so many entries are written with a single call
+        self._batch = bytearray()
+        # When the stream is backed by a file, data is referenced and written with writev
+        self._fd = None
+        self._iov: list[tuple[int, bytes]] = []
+        self._pending = 0
+        if hasattr(os, "writev") and isinstance(getattr(stream, "raw", stream), FileIO):
+            self._fd = stream.fileno()
+        if flush_bytes is None:
+            flush_bytes = FLUSH_BYTES if self._fd is not None else STREAM_FLUSH_BYTES
+        if async_write:
+            # Bound the memory held by queued batches
+            flush_bytes = min(flush_bytes, ASYNC_FLUSH_BYTES)
+        self._flush_threshold = flush_bytes
+        # Set by from_path, written data is dropped from the page cache up to this offset
+        self._direct = False
+        self._dropped_to = 0
+        # With async_write, flushed batches are written by a thread while the next ones are packed
+        self._queue = None
+        self._write_errors: list[Exception] = []
+        if async_write:
+            self._queue = Queue(maxsize=ASYNC_QUEUE_SIZE)
+            thread = Thread(
+                target=_write_worker, args=(self._queue, self._write_errors), daemon=True
+            )
+            thread.start()
+            # Stops the thread if the writer is dropped without being closed, or at exit
+            self._stop_write_thread = finalize(self, _stop_write_thread, self._queue, thread)
+
+    @classmethod
+    def from_path(cls, path: Path | str, direct=False, **kwargs) -> "CPIOWriter":
+        """
+        Opens the file at the path, returning a writer which closes it on close().
+        If direct is set, written data is synced and dropped from the page cache as it is flushed,
+        so large archives don't fill the page cache.
+        """
+        if direct and not hasattr(os, "posix_fadvise"):
+            raise ValueError("Direct writes are not supported on this platform")
+
+        writer = cls(Path(path).open("wb", buffering=0), **kwargs)
+        writer._owns_stream = True
+        writer._direct = direct
+        return writer
 
     def __enter__(self):
         return self
 
-    def __exit__(self, *args):
-        self.close()
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            # Don't finish a failed archive, only release the thread and stream
+            self._release_after_error()
 
     def write(self, data: CPIOData | Iterable[CPIOData] | Mapping[str, CPIOData]):
         """
         Writes the CPIOData objects to the output stream.
         """
+        if isinstance(data, (CPIOData, CPIOHeader)):
+            written = self._write_one(data)
+            self.flush()
+            return written
+
+        entries = data.values() if isinstance(data, Mapping) else data
+        # Resolve the method once, instead of for every entry
+        write_one = self._write_one
         offset = 0
-        iter = [data] if isinstance(data, (CPIOData, CPIOHeader)) else data
-        if isinstance(data, Mapping):
-            iter: Iterable[CPIOData] = data.values()
-        for entry in iter:
-            self.logger.log(5, "Writing entry: %s" % entry)
-            entry_bytes = bytes(entry)
-            padding = pad_cpio(len(entry_bytes))
-            output_bytes = entry_bytes + b"\x00" * padding
-            self.stream.write(output_bytes)
-            self.logger.debug(
-                "[%d] Wrote '%d' bytes for: %s"
-                % (offset, len(output_bytes), entry.name)
-            )
-            offset += len(output_bytes)
+        for entry in entries:
+            offset += write_one(entry)
+        self.flush()
         return offset
 
-    def close(self, close_stream=False):
+    def _write_one(self, entry: CPIOData | CPIOHeader) -> int:
         """
-        Writes the CPIOData objects to the output stream.
+        Adds a single entry to the batch, returning the number of bytes written for it.
+        The batch is not flushed, unless it is over the threshold.
         """
-        written = self.write(
-            CPIOHeader(
-                structure=self.structure,
-                name="TRAILER!!!",
-                logger=self.logger,
+        logger = self.logger
+        if logger.isEnabledFor(5):
+            logger.log(5, "Writing entry: %s", entry)
+        header = entry if isinstance(entry, CPIOHeader) else entry.header
+        # Headers are packed straight into the batch, without building bytes first
+        if header.structure is self.structure:
+            written = self._pack_header(header, self._batch)
+        else:
+            written = header.pack_into(self._batch)
+        if header is not entry:
+            if entry.lazy:
+                # Lazy entries stream their data, so it is never held in memory
+                self.flush()
+                self._wait_writes()
+                written += entry.write_data(self.stream)
+            else:
+                data = entry.data
+                size = len(data)
+                self._write_bytes(data, size)
+                written += size
+        # Entries are aligned to 4 bytes, same as pad_cpio(written)
+        padding = -written & 3
+        if padding:
+            # Padding is never large enough to be referenced or written directly
+            self._batch += _PADS[padding]
+            written += padding
+        if logger.isEnabledFor(DEBUG):
+            # Only resolve the name when it will be logged
+            logger.debug("Wrote '%d' bytes for: %s", written, entry.name)
+        return written
+
+    def _write_bytes(self, data: bytes, size: int) -> None:
+        """Adds size bytes of data to the batch, flushing it once it is over the threshold."""
+        if self._fd is not None and size >= VECTOR_MIN_SIZE:
+            # The data is referenced instead of copied, along with where it goes in the batch
+            self._iov.append((len(self._batch), data))
+            self._pending += size
+            if (
+                len(self._batch) + self._pending >= self._flush_threshold
+                or 2 * len(self._iov) + 1 >= IOV_MAX
+            ):
+                self.flush()
+            return
+
+        if size >= DIRECT_WRITE_SIZE:
+            # Large data is written directly, instead of being copied into the batch
+            self.flush()
+            self._submit(self.stream.write, data)
+            return
+
+        self._batch += data
+        if len(self._batch) + self._pending >= self._flush_threshold:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the batched data to the output stream.
+        With async_write, the data is queued for the write thread.
+        """
+        if self._iov:
+            self._submit(self._writev, self._get_vectors())
+            self._iov.clear()
+            self._pending = 0
+        elif self._batch:
+            self._submit(self.stream.write, self._batch)
+        else:
+            return
+
+        if self._queue is None:
+            # The batch is reused, so the next entries don't need a new buffer
+            self._batch.clear()
+        else:
+            # The queued batch is still being written, so a new one is started
+            self._batch = bytearray()
+        if self._direct:
+            self._submit(self._drop_cache, False)
+
+    def _submit(self, write, data) -> None:
+        """Calls write with the data, or queues it for the write thread."""
+        if self._queue is None:
+            write(data)
+            return
+
+        if self._write_errors:
+            raise self._write_errors[0]
+        self._queue.put((write, data))
+
+    def _wait_writes(self) -> None:
+        """Waits for the queued writes, raising any error from the write thread."""
+        if self._queue is None:
+            return
+
+        self._queue.join()
+        if self._write_errors:
+            raise self._write_errors[0]
+
+    def _drop_cache(self, force=False) -> None:
+        """Syncs the written data and drops it from the page cache, once a batch worth has been written."""
+        self.stream.flush()
+        fd = self.stream.fileno()
+        position = os.lseek(fd, 0, os.SEEK_CUR)
+        if force or position - self._dropped_to >= self._flush_threshold:
+            os.fdatasync(fd)
+            os.posix_fadvise(
+                fd, self._dropped_to, position - self._dropped_to, os.POSIX_FADV_DONTNEED
             )
-        )
-        if close_stream:
+            self._dropped_to = position
+
+    def _get_vectors(self) -> list:
+        """Returns views of the batch, interleaved with the referenced data."""
+        batch = memoryview(self._batch)
+        vectors = []
+        start = 0
+        for end, data in self._iov:
+            if end > start:
+                vectors.append(batch[start:end])
+                start = end
+            vectors.append(data)
+        if start < len(batch):
+            vectors.append(batch[start:])
+        return vectors
+
+    def _writev(self, buffers: list) -> None:
+        """Writes the buffers to the file descriptor, resuming after partial writes."""
+        # Anything buffered by the stream has to land before the data written to the fd
+        self.stream.flush()
+        start = 0
+        while start < len(buffers):
+            written = os.writev(self._fd, buffers[start:] if start else buffers)
+            while start < len(buffers) and written >= len(buffers[start]):
+                written -= len(buffers[start])
+                start += 1
+            if written:
+                buffers[start] = memoryview(buffers[start])[written:]
+
+    def close(self, close_stream=False):
+        """
+        Writes the trailer, then flushes it along with the rest of the batch.
+        """
+        trailer = self._get_trailer()
+        try:
+            self._batch += trailer
+            self.flush()
+            self._wait_writes()
+            if self._direct:
+                self._drop_cache(force=True)
+        except BaseException:
+            # Stop the write thread and release the stream, without masking the write error
+            self._release_after_error(close_stream)
+            raise
+        self._release(close_stream)
+        return len(trailer)
+
+    def _release(self, close_stream=False) -> None:
+        """Stops the write thread, then closes or detaches the stream if the writer owns it."""
+        if self._queue is not None:
+            self._stop_write_thread()
+            self._queue = None
+        if close_stream or self._owns_stream:
             self.stream.close()
-        return written
+        elif self._owns_buffer:
+            # Detach the buffer, so the wrapped stream is left open
+            self.stream.flush()
+            self.stream = self.stream.detach()
+            self._owns_buffer = False
+
+    def _release_after_error(self, close_stream=False) -> None:
+        """Releases the thread and stream after an error, logging errors from the stream instead of raising them."""
+        try:
+            self._release(close_stream)
+        except Exception as e:
+            self.logger.error("Failed to release the stream after an error: %s", e)
+
+    def _get_trailer(self) -> bytes:
+        """Returns the padded trailer bytes for the structure, packing them on first use."""
+        key = tuple(self.structure.items())
+        if key not in _TRAILERS:
+            _TRAILERS[key] = bytes(
+                CPIOHeader(
+                    structure=self.structure,
+                    name="TRAILER!!!",
+                    logger=self.logger,
+                )
+            )
+        return _TRAILERS[key]
 
     def add_entry(
         self, mode: CPIOModes, name: str, data=b"", **kwargs: Unpack[CPIODataKwargs]
@@ -67,7 +360,7 @@ class CPIOWriter(Logged):
 
         kwargs.update(structure=self.structure, logger=self.logger)
 
-        self.write(
+        self._write_one(
             CPIOData.create_entry(
                 name=name,
                 mode=mode.value,
@@ -75,3 +368,4 @@ class CPIOWriter(Logged):
                 **kwargs,
             )
         )
+        self.flush()
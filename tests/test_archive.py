@@ -0,0 +1,103 @@
+from io import BytesIO
+from os import link
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from pycpio import PyCPIO
+from pycpio.cpio.file import CPIO_File
+from pycpio.masks import CPIOModes
+
+
+class TestArchive(TestCase):
+    def test_append_recursive_dedup(self):
+        """Appended files are lazy, only files sharing a size are hashed, and duplicates become hardlinks."""
+        files = {"dup1": b"same" * 100, "dup2": b"same" * 100, "other": b"diff" * 100, "unique": b"u" * 7}
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir)
+            for name, data in files.items():
+                (path / name).write_bytes(data)
+            cpio = PyCPIO()
+            cpio.append_recursive(path, relative=path)
+
+            entries = cpio.entries
+            self.assertTrue(entries["dup1"].lazy)
+            self.assertIsNone(entries["unique"]._hash)
+            self.assertEqual(entries["dup1"].header.ino, entries["dup2"].header.ino)
+            self.assertEqual(entries["dup2"].header.filesize_i, 0)
+            self.assertNotEqual(entries["dup1"].header.ino, entries["other"].header.ino)
+
+            stream = BytesIO()
+            cpio.write_to_stream(stream)
+            stream.seek(0)
+            read = PyCPIO()
+            read.read_from_stream(stream)
+        # The data is only stored with the first link
+        self.assertEqual(read.entries["dup1"].data, files["dup1"])
+        self.assertEqual(read.entries["dup2"].data, b"")
+        self.assertEqual(read.entries["dup2"].header.nlink, b"00000002")
+        for name in ["other", "unique"]:
+            self.assertEqual(read.entries[name].data, files[name])
+
+    def test_pop_lazy_hardlink(self):
+        """Removing the lazy entry holding a hardlink's data reads it once, and moves it to the other link."""
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir)
+            (path / "a").write_bytes(b"hardlink" * 1000)
+            link(path / "a", path / "b")
+            cpio = PyCPIO()
+            cpio.append_recursive(path, relative=path)
+
+            # The entry added first keeps the data, the other link's data is removed
+            owner = next(name for name, entry in cpio.entries.items() if entry.header.filesize_i)
+            other = "b" if owner == "a" else "a"
+            self.assertTrue(cpio.entries[owner].lazy)
+
+            opens = []
+            open_data = CPIO_File._open
+
+            def counting_open(entry):
+                opens.append(entry.name)
+                return open_data(entry)
+
+            with patch.object(CPIO_File, "_open", counting_open):
+                cpio.entries.pop(owner)
+            self.assertEqual(len(opens), 1)
+            self.assertEqual(cpio.entries[other].data, b"hardlink" * 1000)
+            self.assertEqual(cpio.entries[other].header.nlink, b"00000001")
+
+    def test_pop_then_add_duplicate(self):
+        """Data moved to the other link by pop() is still matched by entries added later."""
+        data = b"hardlink" * 1000
+        # Without other entries of the same size the data isn't hashed before the pop, with one it is
+        for other_sizes in [[], [len(data)]]:
+            with self.subTest(other_sizes=other_sizes), TemporaryDirectory() as tmpdir:
+                path = Path(tmpdir)
+                (path / "a").write_bytes(data)
+                link(path / "a", path / "b")
+                for index, size in enumerate(other_sizes):
+                    (path / f"other{index}").write_bytes(b"o" * size)
+                cpio = PyCPIO()
+                cpio.append_recursive(path, relative=path)
+
+                owner = next(name for name in ["a", "b"] if cpio.entries[name].header.filesize_i)
+                other = "b" if owner == "a" else "a"
+                cpio.entries.pop(owner)
+
+                cpio._build_cpio_entry(name="c", entry_type=CPIOModes.File.value, data=data, ino=1 << 20)
+                self.assertEqual(cpio.entries["c"].header.ino, cpio.entries[other].header.ino)
+                self.assertEqual(cpio.entries["c"].header.filesize_i, 0)
+                self.assertEqual(cpio.entries[other].header.nlink, b"00000002")
+
+                # Round trip, the data is written once with the first link
+                stream = BytesIO()
+                cpio.write_to_stream(stream)
+                stream.seek(0)
+                read = PyCPIO()
+                read.read_from_stream(stream)
+                self.assertEqual(read.entries[other].data, data)
+
+
+if __name__ == "__main__":
+    main()
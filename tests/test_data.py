@@ -0,0 +1,42 @@
+from io import BytesIO
+from os import symlink
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from pycpio import PyCPIO
+from pycpio.cpio import CPIOData
+from pycpio.cpio.symlink import CPIO_Symlink
+
+
+class TestFromDir(TestCase):
+    def test_walk_order(self):
+        """Directories are yielded before their contents, siblings sorted by name, symlinked directories aren't followed."""
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir)
+            for name in ["c", "b/z", "b/a", "a/y/x", "d"]:
+                (path / name).parent.mkdir(parents=True, exist_ok=True)
+                (path / name).write_bytes(name.encode())
+            symlink("b", path / "link")
+
+            names = [entry.name for entry in CPIOData.from_dir(path, relative=path)]
+            self.assertEqual(
+                names, [".", "a", "a/y", "a/y/x", "b", "b/a", "b/z", "c", "d", "link"]
+            )
+
+            # Round trip, the symlink keeps its target and the files their data
+            cpio = PyCPIO()
+            cpio.append_recursive(path, relative=path)
+            stream = BytesIO()
+            cpio.write_to_stream(stream)
+            stream.seek(0)
+            read = PyCPIO()
+            read.read_from_stream(stream)
+            self.assertEqual(list(read.entries), names)
+            self.assertIsInstance(read.entries["link"], CPIO_Symlink)
+            self.assertEqual(read.entries["link"].data, b"b\0")
+            self.assertEqual(read.entries["b/z"].data, b"b/z")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+from hashlib import sha256
+from io import BytesIO
+from os import sendfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from pycpio import PyCPIO
+from pycpio.cpio import file as file_module
+from pycpio.masks import CPIOModes
+
+
+def build_archive(files: dict) -> bytes:
+    """Returns the archive bytes with a file entry for each name and data."""
+    cpio = PyCPIO()
+    for ino, (name, data) in enumerate(files.items(), 1):
+        cpio._build_cpio_entry(name=name, entry_type=CPIOModes.File.value, data=data, ino=ino)
+    stream = BytesIO()
+    cpio.write_to_stream(stream)
+    return stream.getvalue()
+
+
+class TestLazyFile(TestCase):
+    files = {"a": b"a" * 5001, "b": bytes(range(256)) * 3000, "c": b"c"}
+
+    def test_lazy_write(self):
+        """Lazy entries read from an archive are written back from it, without holding the data."""
+        archive = build_archive(self.files)
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "in.cpio"
+            path.write_bytes(archive)
+            read = PyCPIO()
+            read.read_cpio_file(path, lazy=True)
+            self.assertTrue(all(entry.lazy for entry in read.entries.values()))
+
+            stream = BytesIO()
+            read.write_to_stream(stream)
+            self.assertEqual(stream.getvalue(), archive)
+            self.assertTrue(read.entries["b"].lazy)
+            # Lazy entries are hashed from their offset in the archive
+            self.assertEqual(read.entries["b"].hash, sha256(self.files["b"]).digest())
+
+    def test_lazy_append(self):
+        """Files appended lazily are read when written."""
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir)
+            for name, data in self.files.items():
+                (path / name).write_bytes(data)
+            cpio = PyCPIO()
+            cpio.append_recursive(path, relative=path)
+            self.assertTrue(cpio.entries["a"].lazy)
+            stream = BytesIO()
+            cpio.write_to_stream(stream)
+            stream.seek(0)
+            read = PyCPIO()
+            read.read_from_stream(stream)
+        for name, data in self.files.items():
+            self.assertEqual(read.entries[name].data, data)
+
+    def test_sendfile(self):
+        """Lazy data is sent to files with sendfile, and copied when it is missing or fails."""
+        archive = build_archive(self.files)
+
+        calls = []
+
+        def counting_sendfile(*args):
+            calls.append(args)
+            return sendfile(*args)
+
+        def failing_sendfile(*args):
+            calls.append(args)
+            raise OSError("sendfile not supported")
+
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "in.cpio"
+            path.write_bytes(archive)
+            out = Path(tmpdir) / "out.cpio"
+            # Each lazy file is sent in one call, a failing call is tried once per file before copying
+            for replacement in [counting_sendfile, None, failing_sendfile]:
+                with self.subTest(sendfile=replacement):
+                    calls.clear()
+                    read = PyCPIO()
+                    read.read_cpio_file(path, lazy=True)
+                    with patch.object(file_module, "sendfile", replacement):
+                        read.write_cpio_file(out)
+                    self.assertEqual(out.read_bytes(), archive)
+                    self.assertEqual(len(calls), len(self.files) if replacement else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from pycpio.cpio import CPIOData
+from pycpio.header import CPIOHeader, HEADER_NEW, get_header_struct
+from pycpio.masks import CPIOModes
+
+
+class TestHeader(TestCase):
+    def test_parse_round_trip(self):
+        """Parsed headers match the packed one, with the integer values cached."""
+        header = CPIOHeader(name="dir/file", ino=12, mtime=1700000000.5, mode=0o100644, filesize=0x1234)
+        parsed = CPIOHeader(bytes(header)[:110])
+        for field in HEADER_NEW:
+            self.assertEqual(getattr(parsed, field), getattr(header, field))
+            self.assertEqual(getattr(parsed, f"{field}_i"), int(getattr(header, field), 16))
+        self.assertEqual(parsed.namesize_i, len("dir/file") + 1)
+        self.assertEqual(parsed.filesize_i, 0x1234)
+        self.assertEqual(parsed.mtime_i, 1700000000)
+        self.assertIs(get_header_struct(HEADER_NEW), get_header_struct(HEADER_NEW))
+
+    def test_field_updates_cache(self):
+        """Setting a field updates its cached integer."""
+        header = CPIOHeader(name="file")
+        # Changing a non zero filesize logs a warning
+        with self.assertLogs(header.logger, "WARNING"):
+            for value in [b"0000000a", "b", 12, 13.9]:
+                header.filesize = value
+                self.assertEqual(header.filesize_i, int(header.filesize, 16))
+        self.assertEqual(header.filesize_i, 13)
+        header.name = "longer_name"
+        self.assertEqual(header.namesize_i, len("longer_name") + 1)
+
+    def test_mode_bits(self):
+        """Setting mode_i sets the mode, permission bits are merged on the integer mode."""
+        header = CPIOHeader(name="dir")
+        header.mode_i = 0o40755
+        self.assertEqual(header.mode, b"000041ed")
+        self.assertEqual(header.mode_type, CPIOModes.Dir)
+
+        header = CPIOHeader(name="file", mode=0o100600, overrides={"mode": 0o644})
+        self.assertEqual(header.mode_i, 0o100644)
+
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "file"
+            path.write_bytes(b"data")
+            path.chmod(0o640)
+            entry = CPIOData.from_path(path, relative=tmpdir)
+            self.assertEqual(entry.header.mode_i, 0o100640)
+            self.assertEqual(entry.header.mode, b"000081a0")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+
+from pycpio import PyCPIO
+from pycpio.masks import CPIOModes
+
+
+class TestReader(TestCase):
+    def test_padding_past_grown_buffer(self):
+        """An entry which fits the read buffer, but whose padding doesn't, must not resize an exported buffer."""
+        cpio = PyCPIO()
+        data = {"a": b"a" * 70001, "b": b"b" * 70005}
+        for ino, (name, content) in enumerate(data.items(), 1):
+            cpio._build_cpio_entry(
+                name=name, entry_type=CPIOModes.File.value, data=content, ino=ino
+            )
+
+        stream = BytesIO()
+        cpio.write_to_stream(stream)
+        stream.seek(0)
+
+        read = PyCPIO()
+        read.read_from_stream(stream)
+        for name, content in data.items():
+            self.assertEqual(read.entries[name].data, content)
+
+    def test_lazy_read_after_seek(self):
+        """Lazy entries read from a stream which didn't start at the file start must point at their data."""
+        archives = []
+        for ino, name in enumerate(["first", "second"], 1):
+            cpio = PyCPIO()
+            cpio._build_cpio_entry(
+                name=name, entry_type=CPIOModes.File.value, data=name.encode() * 10000, ino=ino
+            )
+            stream = BytesIO()
+            cpio.write_to_stream(stream)
+            archives.append(stream.getvalue())
+
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "concat.cpio"
+            path.write_bytes(b"".join(archives))
+            with path.open("rb") as f:
+                f.seek(len(archives[0]))
+                read = PyCPIO()
+                read.read_from_stream(f, lazy=True)
+            self.assertTrue(read.entries["second"].lazy)
+            self.assertEqual(read.entries["second"].data, b"second" * 10000)
+
+    def test_read_only_stream(self):
+        """Streams without readinto are read with read()."""
+
+        class ReadOnly:
+            def __init__(self, data):
+                self.stream = BytesIO(data)
+
+            def read(self, size=-1):
+                # Return short reads, to check they are continued
+                return self.stream.read(min(size, 1000))
+
+        cpio = PyCPIO()
+        cpio._build_cpio_entry(name="a", entry_type=CPIOModes.File.value, data=b"a" * 5001)
+        stream = BytesIO()
+        cpio.write_to_stream(stream)
+
+        read = PyCPIO()
+        read.read_from_stream(ReadOnly(stream.getvalue()))
+        self.assertEqual(read.entries["a"].data, b"a" * 5001)
+
+    def test_readinto_none(self):
+        """A stream returning None from readinto, like a non-blocking stream without data, is treated as no data."""
+
+        class NoData:
+            def readinto(self, view):
+                return None
+
+        read = PyCPIO()
+        with self.assertLogs(read.logger, "WARNING"):
+            read.read_from_stream(NoData())
+        self.assertFalse(read.entries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+from contextlib import nullcontext
+from gc import collect
+from io import BufferedIOBase, BytesIO
+from os import fdopen, pipe, writev
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Thread, active_count
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from pycpio import PyCPIO
+from pycpio.cpio import CPIOData
+from pycpio.header import HEADER_NEW, CPIOHeader
+from pycpio.masks import CPIOModes
+from pycpio.writer import CPIOWriter
+from pycpio.writer import writer as writer_module
+
+
+class WriteCounter(BytesIO):
+    """BytesIO which counts the write calls."""
+
+    writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+class FailingStream(BufferedIOBase):
+    """Stream which fails every write, and optionally its close."""
+
+    def __init__(self, fail_close=False):
+        self.fail_close = fail_close
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        raise OSError("write failed")
+
+    def close(self):
+        super().close()
+        if self.fail_close:
+            raise OSError("close failed")
+
+
+def make_entries(sizes):
+    """Returns file entries with the given data sizes, each with distinct data and inode."""
+    return [
+        CPIOData.create_entry(
+            name=f"file{ino}",
+            mode=CPIOModes.File.value,
+            data=bytes([ino % 256]) * size,
+            ino=ino,
+            mtime=0,
+        )
+        for ino, size in enumerate(sizes, 1)
+    ]
+
+
+def expected_bytes(entries):
+    """Returns the archive bytes built entry by entry, without the writer."""
+    out = bytearray()
+    for entry in entries:
+        out += bytes(entry.header) + entry.data
+        out += b"\0" * (-len(out) & 3)
+    out += bytes(CPIOHeader(name="TRAILER!!!"))
+    return bytes(out)
+
+
+def read_back(data: bytes) -> dict:
+    """Reads the archive bytes, returning the data of each entry by name."""
+    cpio = PyCPIO()
+    cpio.read_from_stream(BytesIO(data))
+    return {name: entry.data for name, entry in cpio.entries.items()}
+
+
+class TestWriter(TestCase):
+    def test_write_flushes(self):
+        """Entries are on the stream once write() returns, the trailer is added by close()."""
+        entries = make_entries([10, 100])
+        stream = BytesIO()
+        writer = CPIOWriter(stream)
+        written = writer.write(entries)
+        self.assertEqual(stream.getvalue(), expected_bytes(entries)[:written])
+
+        writer.add_entry(CPIOModes.Dir, "dir", mtime=0, ino=10)
+        self.assertGreater(len(stream.getvalue()), written)
+
+    def test_flush_threshold(self):
+        """Batches are written once they reach the threshold, the output doesn't depend on it."""
+        entries = make_entries([100_000] * 30)
+        expected = expected_bytes(entries)
+        writes = {}
+        for flush_bytes in [None, 1, 1 << 30]:
+            stream = WriteCounter()
+            with CPIOWriter(stream, flush_bytes=flush_bytes) as writer:
+                writer.write(entries)
+            self.assertEqual(stream.getvalue(), expected)
+            writes[flush_bytes] = stream.writes
+        # One write for the entries, and one for the trailer
+        self.assertEqual(writes[1 << 30], 2)
+        # Streams without writev are flushed every 1 MiB by default
+        self.assertGreater(writes[None], 3)
+        self.assertGreaterEqual(writes[1], len(entries))
+        self.assertEqual(read_back(expected)["file1"], entries[0].data)
+
+    def test_async_write(self):
+        """Async writes keep the entry order."""
+        entries = make_entries([10, 5000, 100_000, 3] * 20)
+        stream = BytesIO()
+        with CPIOWriter(stream, async_write=True, flush_bytes=4096) as writer:
+            writer.write(entries)
+        self.assertEqual(stream.getvalue(), expected_bytes(entries))
+
+    def test_async_write_error(self):
+        """Errors from the write thread are raised by the writer, which still stops the thread."""
+        threads = active_count()
+        for fail_close in [False, True]:
+            writer = CPIOWriter(FailingStream(fail_close), async_write=True, flush_bytes=1)
+            try:
+                writer.write(make_entries([10] * 10))
+            except OSError:
+                # The error is raised by write() if the thread already failed
+                pass
+            # A failing close is logged, the write error is raised
+            with self.assertLogs(writer.logger, "ERROR") if fail_close else nullcontext():
+                with self.assertRaisesRegex(OSError, "write failed"):
+                    writer.close(close_stream=True)
+            self.assertEqual(active_count(), threads)
+
+    def test_async_write_dropped(self):
+        """A writer dropped without close() doesn't keep its thread running."""
+        threads = active_count()
+        writer = CPIOWriter(BytesIO(), async_write=True)
+        writer.write(make_entries([10]))
+        writer = None
+        collect()
+        self.assertEqual(active_count(), threads)
+
+    def test_writev(self):
+        """Files are written with writev, split into calls of at most IOV_MAX buffers."""
+        entries = make_entries([5000, 10, 70000, 4096, 3] * 10)
+        expected = expected_bytes(entries)
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "out.cpio"
+            for iov_max in [writer_module.IOV_MAX, 8]:
+                # Only keep the buffer counts, holding the buffers would keep the batch exported
+                counts = []
+
+                def counting_writev(fd, buffers):
+                    counts.append(len(buffers))
+                    return writev(fd, buffers)
+
+                with (
+                    patch.object(writer_module, "IOV_MAX", iov_max),
+                    patch.object(writer_module.os, "writev", counting_writev),
+                ):
+                    with path.open("wb") as f:
+                        with CPIOWriter(f) as writer:
+                            writer.write(entries)
+                self.assertEqual(path.read_bytes(), expected)
+                self.assertTrue(counts)
+                self.assertLessEqual(max(counts), iov_max)
+
+    def test_writev_partial(self):
+        """Partial writes to a pipe are continued from the unwritten data."""
+        entries = make_entries([100_000] * 20)
+        read_fd, write_fd = pipe()
+        output = []
+        with fdopen(read_fd, "rb") as reader:
+            thread = Thread(target=lambda: output.append(reader.read()))
+            thread.start()
+            with fdopen(write_fd, "wb") as f:
+                with CPIOWriter(f) as writer:
+                    writer.write(entries)
+            thread.join()
+        self.assertEqual(output[0], expected_bytes(entries))
+
+    def test_iov_max_fallback(self):
+        """Platforms which don't report IOV_MAX use 1024."""
+        for sysconf in [lambda name: -1, lambda name: 0]:
+            with patch.object(writer_module.os, "sysconf", sysconf):
+                self.assertEqual(writer_module._get_iov_max(), 1024)
+        with patch.object(writer_module.os, "sysconf", side_effect=ValueError):
+            self.assertEqual(writer_module._get_iov_max(), 1024)
+
+    def test_from_path_direct(self):
+        """Direct writes drop the written data from the page cache, the archive is the same."""
+        entries = make_entries([100_000] * 30)
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "out.cpio"
+            advised = []
+
+            def counting_fadvise(fd, offset, length, advice):
+                advised.append((offset, length, advice))
+
+            with patch.object(writer_module.os, "posix_fadvise", counting_fadvise):
+                with CPIOWriter.from_path(path, direct=True, flush_bytes=1 << 20) as writer:
+                    writer.write(entries)
+            self.assertEqual(path.read_bytes(), expected_bytes(entries))
+            self.assertTrue(writer.stream.closed)
+            # The dropped ranges follow each other, up to the end of the archive
+            self.assertGreater(len(advised), 1)
+            self.assertEqual(advised[0][0], 0)
+            for (offset, length, _), (next_offset, _, _) in zip(advised, advised[1:]):
+                self.assertEqual(offset + length, next_offset)
+            self.assertEqual(advised[-1][0] + advised[-1][1], path.stat().st_size)
+            self.assertEqual(read_back(path.read_bytes())["file30"], entries[-1].data)
+
+    def test_trailer_cache(self):
+        """The trailer is packed once per structure, and closes every archive the same way."""
+        trailer = bytes(CPIOHeader(name="TRAILER!!!"))
+        outputs = []
+        trailers = []
+        for _ in range(2):
+            stream = BytesIO()
+            writer = CPIOWriter(stream, structure=dict(HEADER_NEW))
+            written = writer.write(make_entries([10]))
+            self.assertEqual(writer.close(), len(trailer))
+            trailers.append(writer._get_trailer())
+            outputs.append(stream.getvalue())
+            self.assertEqual(outputs[-1][written:], trailer)
+        # Equal structures share the cached trailer
+        self.assertIs(trailers[0], trailers[1])
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(list(read_back(outputs[0])), ["file1"])
+
+
+if __name__ == "__main__":
+    main()